@@ -0,0 +1,58 @@
+import io
+import os
+import pickle
+import logging
+import xxhash
+from typing import List, BinaryIO, Optional, Union
+from pypdf import PdfReader
+from llama_index.core import Document
+
+log = logging.getLogger(__name__)
+
+class DocumentLoader:
+    def __init__(self, cache_dir: str = "./cache/pdf"):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def fingerprint(pdf_file_content: bytes) -> str:
+        """Returns the content hash used to key cached PDFs (non-cryptographic; xxh3 is several times faster than SHA/BLAKE2)."""
+        return xxhash.xxh3_128_hexdigest(pdf_file_content)
+
+    def extract_pages_from_pdf(self, pdf_file: Union[str, BinaryIO]) -> List[str]:
+        """Extracts the text of each page of a PDF (path or binary stream)."""
+        reader = PdfReader(pdf_file)
+        return [page.extract_text() or "" for page in reader.pages]
+
+    def load_cached(self, pdf_hash: str) -> Optional[List[Document]]:
+        """Returns the cached Documents for a PDF content hash, or None if it has not been parsed yet."""
+        cache_path = os.path.join(self.cache_dir, f"{pdf_hash}.pkl")
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with open(cache_path, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            log.warning("Failed to read PDF cache %s: %s", cache_path, e)
+            return None
+
+    def load_pdf(self, pdf_file_content: bytes, filename: str, pdf_hash: Optional[str] = None) -> List[Document]:
+        """Parses PDF bytes in memory into LlamaIndex Documents, reusing cached results for identical content.
+        Pass pdf_hash when the caller has already fingerprinted the content.
+        """
+        pdf_hash = pdf_hash or self.fingerprint(pdf_file_content)
+        documents = self.load_cached(pdf_hash)
+        if documents is not None:
+            log.info("Loaded cached documents for '%s' (%s)", filename, pdf_hash)
+            return documents
+
+        pages = self.extract_pages_from_pdf(io.BytesIO(pdf_file_content))
+        # Content-derived ids let IndexBuilder's refresh recognise re-uploads instead of re-inserting them.
+        # The upload name stays out of the metadata: Document.hash covers it, and a rename must not re-embed the PDF.
+        documents = [
+            Document(id_=f"{pdf_hash}-p{i}", text=text, metadata={"page": i + 1})
+            for i, text in enumerate(pages)
+        ]
+        with open(os.path.join(self.cache_dir, f"{pdf_hash}.pkl"), "wb") as f:
+            pickle.dump(documents, f)
+        return documents
@@ -1,16 +1,62 @@
+import logging
+from functools import lru_cache
+import torch
 from llama_index.core import Settings
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from llama_index.llms.ollama import Ollama
 from llama_index.core.node_parser import SentenceSplitter
 
+log = logging.getLogger(__name__)
+
+MODEL_KEEP_ALIVE = "30m"  # idle time before Ollama unloads a model, so models no longer selected free RAM/VRAM
+
+_active_config = None
+
+def create_llm(llm_model_name: str) -> Ollama:
+    """Builds a new Ollama client. Its AsyncClient binds to the first event loop it runs on, so code that runs
+    each query under a fresh loop (tree_summarize with use_async) needs a new client per query.
+    """
+    # Keep the model resident across a working session instead of unloading it after 5 idle minutes,
+    # while still freeing models that are no longer selected
+    return Ollama(model=llm_model_name, keep_alive=MODEL_KEEP_ALIVE)
+
+@lru_cache(maxsize=8)
+def get_llm(llm_model_name: str) -> Ollama:
+    """Returns the process-wide Ollama client for a model."""
+    return create_llm(llm_model_name)
+
+@lru_cache(maxsize=4)
+def get_embed_model(embedding_model_name: str, quantize: bool = True) -> HuggingFaceEmbedding:
+    """Loads an embedding model once per process; reloading its weights takes seconds.
+    On CPU, quantize swaps the transformer's Linear layers for dynamic int8 ones.
+    """
+    embed_model = HuggingFaceEmbedding(model_name=embedding_model_name, embed_batch_size=64)
+    if quantize and embed_model._model.device.type == "cpu":
+        torch.quantization.quantize_dynamic(embed_model._model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return embed_model
+
+@lru_cache(maxsize=4)
+def _get_node_parser(chunk_size: int, chunk_overlap: int) -> SentenceSplitter:
+    """Builds one splitter per chunking configuration instead of one per settings call."""
+    return SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
 def configure_llama_index_settings(
     llm_model_name: str = "llama2",
     embedding_model_name: str = "BAAI/bge-small-en-v1.5",
     chunk_size: int = 1000,
     chunk_overlap: int = 200,
+    quantize_embeddings: bool = True,
 ):
-    """Configures global LlamaIndex settings for LLM, embedding model, and node parser."""
-    Settings.llm = Ollama(model=llm_model_name)
-    Settings.embed_model = HuggingFaceEmbedding(model_name=embedding_model_name)
-    Settings.node_parser = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    print(f"LlamaIndex global settings configured: LLM='{llm_model_name}', EmbedModel='{embedding_model_name}', ChunkSize={chunk_size}") 
\ No newline at end of file
+    """Configures global LlamaIndex settings for LLM, embedding model, and node parser.
+    Repeated calls with the same arguments are no-ops, and models are reused across calls.
+    """
+    global _active_config
+    config = (llm_model_name, embedding_model_name, chunk_size, chunk_overlap, quantize_embeddings)
+    if config == _active_config:
+        return
+    Settings.llm = get_llm(llm_model_name)
+    Settings.embed_model = get_embed_model(embedding_model_name, quantize_embeddings)
+    Settings.node_parser = _get_node_parser(chunk_size, chunk_overlap)
+    log.info("LlamaIndex global settings configured: LLM='%s', EmbedModel='%s', ChunkSize=%s",
+             llm_model_name, embedding_model_name, chunk_size)
+    _active_config = config
@@ -4,10 +4,15 @@ from llama_index.core import (
     VectorStoreIndex,
     SummaryIndex,
     StorageContext,
+    Settings,
     load_index_from_storage,
 )
 import os
 import shutil
+import hashlib
+import logging
+
+log = logging.getLogger(__name__)
 
 class IndexBuilder:
     def __init__(self, persist_root_dir: str = "./llama_index_data"):
@@ -16,8 +21,59 @@ class IndexBuilder:
 
     def _get_storage_context(self, index_name: str) -> StorageContext:
         persist_dir = os.path.join(self.persist_root_dir, index_name)
+        if not os.path.exists(os.path.join(persist_dir, "docstore.json")):
+            return StorageContext.from_defaults()
         return StorageContext.from_defaults(persist_dir=persist_dir)
 
+    @staticmethod
+    def _corpus_hash(documents: List[Document]) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        for doc in sorted(documents, key=lambda d: d.doc_id):
+            digest.update(f"{doc.doc_id}:{doc.hash}".encode())
+        return digest.hexdigest()
+
+    def _read_corpus_hash(self, index_persist_path: str) -> Optional[str]:
+        marker = os.path.join(index_persist_path, "corpus_hash")
+        if os.path.exists(marker):
+            with open(marker) as f:
+                return f.read().strip()
+        return None
+
+    def _write_corpus_hash(self, index_persist_path: str, corpus_hash: str):
+        with open(os.path.join(index_persist_path, "corpus_hash"), "w") as f:
+            f.write(corpus_hash)
+
+    @staticmethod
+    def _build_vector_index(documents: List[Document], storage_context: StorageContext) -> VectorStoreIndex:
+        """Builds a VectorStoreIndex from length-sorted nodes so each embedding batch needs little padding."""
+        nodes = Settings.node_parser.get_nodes_from_documents(documents)
+        nodes.sort(key=lambda n: len(n.get_content()))
+        # from_documents records these hashes; refresh_ref_docs relies on them to detect unchanged documents.
+        for doc in documents:
+            storage_context.docstore.set_document_hash(doc.doc_id, doc.hash)
+        return VectorStoreIndex(nodes, storage_context=storage_context)
+
+    @staticmethod
+    def _refresh_documents(index, documents: List[Document]) -> bool:
+        """Inserts new documents in one batch and updates changed ones; returns whether anything changed.
+        refresh_ref_docs inserts new documents one at a time, so each page would be embedded in its own small batch.
+        """
+        docstore = index.storage_context.docstore
+        new_docs = []
+        changed = False
+        for doc in documents:
+            existing_hash = docstore.get_document_hash(doc.doc_id)
+            if existing_hash is None:
+                new_docs.append(doc)
+            elif existing_hash != doc.hash:
+                index.update_ref_doc(doc)
+                changed = True
+        if new_docs:
+            index.insert_nodes(Settings.node_parser.get_nodes_from_documents(new_docs))
+            for doc in new_docs:
+                docstore.set_document_hash(doc.doc_id, doc.hash)
+        return changed or bool(new_docs)
+
     def _build_or_load_index(self, index_class, documents: Optional[List[Document]], index_name: str):
         storage_context = self._get_storage_context(index_name)
         index_persist_path = os.path.join(self.persist_root_dir, index_name)
@@ -25,25 +81,35 @@ class IndexBuilder:
         try:
             if os.path.exists(os.path.join(index_persist_path, "docstore.json")):
                 index = load_index_from_storage(storage_context)
-                print(f"Loaded existing {index_class.__name__} '{index_name}' from {index_persist_path}")
-                if documents: 
-                    print(f"Refreshing {len(documents)} documents in existing index '{index_name}'")
-                    # Use refresh_ref_docs for potentially more efficient updates
-                    index.refresh_ref_docs(documents)
-                    index.storage_context.persist(persist_dir=index_persist_path)
-                    print(f"Persisted updated index '{index_name}' to {index_persist_path}")
+                log.info("Loaded existing %s '%s' from %s", index_class.__name__, index_name, index_persist_path)
+                if documents:
+                    corpus_hash = self._corpus_hash(documents)
+                    if self._read_corpus_hash(index_persist_path) == corpus_hash:
+                        log.info("Index '%s' already up to date with these documents; skipping refresh.", index_name)
+                        return index
+                    log.info("Refreshing %d documents in existing index '%s'", len(documents), index_name)
+                    if self._refresh_documents(index, documents):
+                        index.storage_context.persist(persist_dir=index_persist_path)
+                        log.info("Persisted updated index '%s' to %s", index_name, index_persist_path)
+                    else:
+                        log.info("No document changes for index '%s'; skipping persist.", index_name)
+                    self._write_corpus_hash(index_persist_path, corpus_hash)
                 return index
             elif documents:
-                print(f"Building new {index_class.__name__} '{index_name}' with {len(documents)} documents.")
-                index = index_class.from_documents(documents, storage_context=storage_context)
+                log.info("Building new %s '%s' with %d documents.", index_class.__name__, index_name, len(documents))
+                if index_class is VectorStoreIndex:
+                    index = self._build_vector_index(documents, storage_context)
+                else:
+                    index = index_class.from_documents(documents, storage_context=storage_context)
                 index.storage_context.persist(persist_dir=index_persist_path)
-                print(f"Persisted new index '{index_name}' to {index_persist_path}")
+                self._write_corpus_hash(index_persist_path, self._corpus_hash(documents))
+                log.info("Persisted new index '%s' to %s", index_name, index_persist_path)
                 return index
             else:
-                print(f"No documents to build new {index_class.__name__} '{index_name}', and no existing index found.")
+                log.warning("No documents to build new %s '%s', and no existing index found.", index_class.__name__, index_name)
                 return None
         except Exception as e:
-            print(f"Error building/loading {index_class.__name__} '{index_name}': {e}. Consider clearing storage.")
+            log.error("Error building/loading %s '%s': %s. Consider clearing storage.", index_class.__name__, index_name, e)
             return None
 
     def get_vector_index(self, documents: Optional[List[Document]] = None, index_name: str = "vector_index") -> Optional[VectorStoreIndex]:
@@ -56,14 +122,14 @@ class IndexBuilder:
         index_persist_path = os.path.join(self.persist_root_dir, index_name)
         if os.path.exists(index_persist_path):
             shutil.rmtree(index_persist_path)
-            print(f"Cleared storage for index '{index_name}' at {index_persist_path}")
+            log.info("Cleared storage for index '%s' at %s", index_name, index_persist_path)
         else:
-            print(f"No storage found for index '{index_name}' at {index_persist_path}")
+            log.info("No storage found for index '%s' at %s", index_name, index_persist_path)
 
     def clear_all_storage(self):
         if os.path.exists(self.persist_root_dir):
             shutil.rmtree(self.persist_root_dir)
-            print(f"Cleared all LlamaIndex storage at {self.persist_root_dir}")
+            log.info("Cleared all LlamaIndex storage at %s", self.persist_root_dir)
             os.makedirs(self.persist_root_dir, exist_ok=True)
         else:
-            print(f"No LlamaIndex storage found at {self.persist_root_dir}") 
\ No newline at end of file
+            log.info("No LlamaIndex storage found at %s", self.persist_root_dir) 
\ No newline at end of file
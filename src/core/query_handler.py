@@ -1,62 +1,115 @@
-from typing import Optional
+import asyncio
+import logging
+import threading
+from typing import Iterator, List, Optional
 from llama_index.core import VectorStoreIndex, SummaryIndex
-from llama_index.core.query_engine import QueryEngine, RetrieverQueryEngine
+from llama_index.core.base.base_query_engine import BaseQueryEngine
+from llama_index.core.llms import LLM
+from llama_index.core.query_engine import RetrieverQueryEngine
 from llama_index.core.postprocessor import SimilarityPostprocessor
+from llama_index.core.retrievers import QueryFusionRetriever
+from llama_index.retrievers.bm25 import BM25Retriever
+from llama_index.core.prompts import PromptTemplate
+
+log = logging.getLogger(__name__)
+
+# Static instructions lead and per-chunk text trails, so Ollama can reuse the KV cache
+# of the shared prefix across the many chunk calls tree_summarize makes for one query.
+SUMMARY_TEMPLATE = PromptTemplate(
+    "Using only the document excerpts below and not prior knowledge, answer the query.\n"
+    "Query: {query_str}\n\n"
+    "DOCUMENT:\n{context_str}\n\n"
+    "Answer: "
+)
 
 class QueryHandler:
+    def __init__(self):
+        self._batch_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._batch_loop_lock = threading.Lock()
+
     def get_vector_query_engine(
         self,
         index: VectorStoreIndex,
         similarity_top_k: int = 3,
-        use_hybrid_search: bool = True
-    ) -> Optional[QueryEngine]:
+        use_hybrid_search: bool = True,
+        streaming: bool = False,
+        llm: Optional[LLM] = None
+    ) -> Optional[BaseQueryEngine]:
         """Creates a query engine for a VectorStoreIndex.
-        If use_hybrid_search is True, it currently uses vector search with a doubled similarity_top_k.
+        If use_hybrid_search is True, vector and BM25 results are fused with reciprocal rank fusion.
+        With streaming, queries return a StreamingResponse; consume it via stream_query.
+        llm defaults to Settings.llm.
         """
         if not index:
-            print("Error: Index not provided to get_vector_query_engine.")
+            log.error("Index not provided to get_vector_query_engine.")
             return None
-            
-        effective_top_k = similarity_top_k
-        if use_hybrid_search:
-            # The original "hybrid" mode effectively increased top_k for the vector retriever.
-            # True hybrid search (e.g., BM25 + vector) was not fully implemented.
-            # This maintains the behavior of fetching more results from the vector store.
-            effective_top_k = similarity_top_k * 2
-            # Consider logging or print statement if detailed clarification of "hybrid" mode is needed at runtime.
-            # print("Note: Hybrid search enabled. Using vector search with increased top_k.")
 
         try:
-            retriever = index.as_retriever(similarity_top_k=effective_top_k)
+            retriever = index.as_retriever(similarity_top_k=similarity_top_k)
         except Exception as e:
-            print(f"Failed to create vector retriever: {e}. Falling back to default similarity_top_k.")
+            log.error("Failed to create vector retriever: %s", e)
+            return None
+
+        # RRF scores are rank-based (~1/60), so the cosine similarity cutoff only applies to pure vector search.
+        node_postprocessors = [SimilarityPostprocessor(similarity_cutoff=0.7)]
+        # A PDF without a text layer (e.g. scanned) leaves the docstore empty, and BM25 has nothing to rank.
+        if use_hybrid_search and index.docstore.docs:
             try:
-                retriever = index.as_retriever(similarity_top_k=similarity_top_k)
-            except Exception as e_fallback:
-                print(f"Failed to create vector retriever even with default top_k: {e_fallback}.")
-                return None
-        
+                # BM25 reads node text from the docstore, so it adds no embedding work.
+                # It fails at query time when top_k exceeds the corpus, so cap it for short PDFs.
+                bm25_retriever = BM25Retriever.from_defaults(
+                    docstore=index.docstore,
+                    similarity_top_k=min(similarity_top_k, len(index.docstore.docs))
+                )
+                retriever = QueryFusionRetriever(
+                    [retriever, bm25_retriever],
+                    similarity_top_k=similarity_top_k,
+                    num_queries=1,  # No LLM query rewriting
+                    mode="reciprocal_rerank",
+                    use_async=False,
+                    llm=llm,
+                )
+                node_postprocessors = []
+            except Exception as e:
+                log.warning("Failed to create BM25 retriever: %s. Falling back to vector search.", e)
+
         return RetrieverQueryEngine.from_args(
             retriever=retriever,
-            node_postprocessors=[SimilarityPostprocessor(similarity_cutoff=0.7)]
+            node_postprocessors=node_postprocessors,
+            streaming=streaming,
+            llm=llm
         )
 
     def get_summary_query_engine(
         self,
         index: SummaryIndex,
-        response_mode: str = "tree_summarize"
-    ) -> Optional[QueryEngine]:
-        """Creates a query engine for a SummaryIndex."""
+        response_mode: str = "tree_summarize",
+        use_async: bool = False,
+        streaming: bool = False,
+        llm: Optional[LLM] = None
+    ) -> Optional[BaseQueryEngine]:
+        """Creates a query engine for a SummaryIndex.
+        With use_async, tree_summarize sends the per-chunk summaries to the LLM concurrently before the final reduce;
+        Ollama serves them in parallel up to OLLAMA_NUM_PARALLEL. It runs each query under a new event loop, so pass
+        an llm whose async client is not bound to an earlier one, i.e. a fresh client per query (create_llm).
+        llm defaults to Settings.llm.
+        """
         if not index:
-            print("Error: Index not provided to get_summary_query_engine.")
+            log.error("Index not provided to get_summary_query_engine.")
             return None
         try:
-            return index.as_query_engine(response_mode=response_mode)
+            return index.as_query_engine(
+                response_mode=response_mode,
+                use_async=use_async,
+                streaming=streaming,
+                summary_template=SUMMARY_TEMPLATE,
+                llm=llm
+            )
         except Exception as e:
-            print(f"Failed to create summary query engine: {e}.")
+            log.error("Failed to create summary query engine: %s", e)
             return None
 
-    def query_index(self, query_engine: Optional[QueryEngine], query_text: str) -> Optional[str]:
+    def query_index(self, query_engine: Optional[BaseQueryEngine], query_text: str) -> Optional[str]:
         """Executes a query using the provided query engine."""
         if not query_engine:
             return "Query engine not available."
@@ -66,4 +119,48 @@ class QueryHandler:
             response = query_engine.query(query_text)
             return str(response)
         except Exception as e:
-            return f"Error during query: {e}" 
\ No newline at end of file
+            return f"Error during query: {e}"
+
+    def stream_query(self, query_engine: Optional[BaseQueryEngine], query_text: str) -> Iterator[str]:
+        """Executes a query on a streaming query engine, yielding response tokens as the LLM produces them."""
+        if not query_engine:
+            yield "Query engine not available."
+            return
+        if not query_text or not query_text.strip():
+            yield "Query text is empty."
+            return
+        try:
+            response = query_engine.query(query_text)
+            yield from response.response_gen
+        except Exception as e:
+            yield f"Error during query: {e}"
+
+    def _get_batch_loop(self) -> asyncio.AbstractEventLoop:
+        """Returns the background event loop that batch queries run on, starting it on first use.
+        Async LLM clients (Ollama's AsyncClient) stay bound to the first loop they ran on, so every batch shares one.
+        """
+        with self._batch_loop_lock:
+            if self._batch_loop is None:
+                self._batch_loop = asyncio.new_event_loop()
+                threading.Thread(target=self._batch_loop.run_forever, name="query-batch-loop", daemon=True).start()
+            return self._batch_loop
+
+    def query_index_batch(self, query_engine: Optional[BaseQueryEngine], query_texts: List[str]) -> List[str]:
+        """Executes several queries concurrently so their LLM calls overlap instead of running back to back.
+        Blocks until every query finishes, so call it off the UI event loop.
+        """
+        if not query_engine:
+            return ["Query engine not available."] * len(query_texts)
+
+        async def _query(query_text: str) -> str:
+            if not query_text or not query_text.strip():
+                return "Query text is empty."
+            try:
+                return str(await query_engine.aquery(query_text))
+            except Exception as e:
+                return f"Error during query: {e}"
+
+        async def _gather() -> List[str]:
+            return list(await asyncio.gather(*(_query(q) for q in query_texts)))
+
+        return asyncio.run_coroutine_threadsafe(_gather(), self._get_batch_loop()).result()
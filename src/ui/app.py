@@ -1,72 +1,267 @@
 import sys
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
 from pathlib import Path
+from typing import Generic, Iterator, TypeVar
 sys.path.append(str(Path(__file__).resolve().parents[2]))
 
-from nicegui import ui, events
+from nicegui import ui, events, background_tasks, Client
+from nicegui import run as nicegui_run  # aliased: this module defines its own run()
+from llama_index.core import VectorStoreIndex, SummaryIndex
+from llama_index.core.base.base_query_engine import BaseQueryEngine
+from src.core.document_loader import DocumentLoader
+from src.core.global_settings import MODEL_KEEP_ALIVE, configure_llama_index_settings, create_llm, get_llm
+from src.core.index_builder import IndexBuilder
+from src.core.query_handler import QueryHandler
 from src.utils.ollama_manager import OllamaManager
 
+log = logging.getLogger(__name__)
+
 # Global state for Ollama management
 ollama_manager = OllamaManager()
 ollama_status: str | None = None
 installed_models: list[str] = []
+default_model: str | None = None
+setup_lock = asyncio.Lock()
 
+# Document helpers are built once per process and shared by every page and client
+document_loader = DocumentLoader()
+index_builder = IndexBuilder()
+query_handler = QueryHandler()
 
-def setup_ollama() -> None:
-    """Start or connect to the local Ollama service (runs once)."""
-    global ollama_status, installed_models
+MAX_CACHED_PDFS = 8
+STREAM_FLUSH_INTERVAL = 0.08  # seconds between UI updates while an answer streams in
 
-    # Only attempt to start once
-    if ollama_status is not None:
-        return
+K = TypeVar("K")
+V = TypeVar("V")
 
-    with ui.dialog() as dialog, ui.card():
-        ui.label("Connecting to Ollama service…")
-    dialog.open()
 
-    status = ollama_manager.start()
-    ollama_status = status
+class LRUCache(Generic[K, V]):
+    """Thread-safe mapping that evicts its least recently used entry beyond maxsize."""
 
-    if status in ("already_running", "started"):
-        installed_models = ollama_manager.get_installed_models()
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict[K, V] = OrderedDict()
+        self._lock = threading.Lock()
 
-    dialog.close()
+    def __contains__(self, key: K) -> bool:
+        return key in self._data
 
+    def get(self, key: K) -> V | None:
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
 
-def render_sidebar() -> None:
-    """Render the persistent sidebar (drawer) with configuration and controls."""
-    with ui.drawer(side='left', value=True).classes("bg-grey-2 flex flex-col p-4 space-y-4"):
-        ui.label("Configuration").classes("text-h6")
-
-        # Ollama status feedback
-        if ollama_status == "already_running":
-            ui.badge("Connected to existing Ollama service.", color="green", outline=True)
-        elif ollama_status == "started":
-            ui.badge("Ollama service started successfully.", color="green", outline=True)
-        elif ollama_status == "not_found":
-            ui.badge("Ollama not found. Please install it.", color="red", outline=True)
-            return  # Do not render further sidebar options
-        elif ollama_status == "failed_to_start":
-            ui.badge("Failed to start Ollama. Check for conflicts.", color="red", outline=True)
+    def put(self, key: K, value: V) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+# Built indexes, keyed by PDF content hash, so re-processing the same file skips parsing and index loading.
+# Evicted indexes are reloaded from the PDF cache and their persist dir on next use.
+vector_indexes: LRUCache[str, VectorStoreIndex] = LRUCache(MAX_CACHED_PDFS)
+# Query engines (retrievers, BM25 state) keyed by (PDF content hash, LLM model)
+query_engines: LRUCache[tuple[str, str], BaseQueryEngine] = LRUCache(2 * MAX_CACHED_PDFS)
+# Summary indexes are only built once a summary is requested
+summary_indexes: LRUCache[str, SummaryIndex] = LRUCache(MAX_CACHED_PDFS)
+# A fixed pool of locks striped by build key, so concurrent clicks or clients never build the same index (and
+# persist dir) or engine twice at once, while the registry stays bounded like the caches above. Builds never nest
+# these locks, so two keys sharing a stripe only wait on each other.
+BUILD_LOCK_STRIPES = 16
+_build_locks = [threading.Lock() for _ in range(BUILD_LOCK_STRIPES)]
+
+
+def build_lock(key) -> threading.Lock:
+    return _build_locks[hash(key) % BUILD_LOCK_STRIPES]
+
+
+class ClientState:
+    """State owned by one browser client, so a model choice does not leak into other users' sessions."""
+
+    def __init__(self):
+        self.selected_model: str | None = None
+
+    @property
+    def model(self) -> str | None:
+        return self.selected_model or default_model
+
+
+def warm_up_model(model: str) -> None:
+    """Load the model into Ollama in the background so the first query does not pay for it."""
+    background_tasks.create(nicegui_run.io_bound(ollama_manager.warm_up, model, MODEL_KEEP_ALIVE))
+
+
+async def setup_ollama() -> None:
+    """Start or connect to the local Ollama service (runs once) without blocking the event loop."""
+    global ollama_status, installed_models, default_model
+
+    async with setup_lock:
+        # Only attempt to start once
+        if ollama_status is not None:
             return
 
-        # Model selection dropdown
-        if installed_models:
-            ui.select(installed_models, label="Choose LLM Model", value=installed_models[0])
-        else:
-            ui.label("No Ollama models found.")
+        status = await nicegui_run.io_bound(ollama_manager.start)
+        if status in ("already_running", "started"):
+            installed_models = await nicegui_run.io_bound(ollama_manager.get_installed_models)
+            default_model = installed_models[0] if installed_models else None
+            if default_model:
+                warm_up_model(default_model)
+        ollama_status = status
+
+    render_sidebar_content.refresh()
+
 
-        ui.separator()
-        ui.label("Service Management").classes("text-h6")
+def render_sidebar(state: ClientState) -> None:
+    """Render the persistent sidebar (drawer) with configuration and controls."""
+    with ui.drawer(side='left', value=True).classes("bg-grey-2 flex flex-col p-4 space-y-4"):
+        render_sidebar_content(state)
 
-        def stop_service() -> None:
-            ollama_manager.stop()
-            ui.notify("Ollama service stopped.", type="positive")
 
-        ui.button("Stop Ollama Service", on_click=stop_service)
-        ui.markdown("Ollama is automatically managed. It will shut down if this app started it and you close the app.")
+@ui.refreshable
+def render_sidebar_content(state: ClientState) -> None:
+    """Render the sidebar contents; refreshed once the Ollama status is known."""
+    ui.label("Configuration").classes("text-h6")
 
+    # Ollama status feedback
+    if ollama_status is None:
+        with ui.row().classes("items-center"):
+            ui.spinner()
+            ui.label("Connecting to Ollama service…")
+        return
+    elif ollama_status == "already_running":
+        ui.badge("Connected to existing Ollama service.", color="green", outline=True)
+    elif ollama_status == "started":
+        ui.badge("Ollama service started successfully.", color="green", outline=True)
+    elif ollama_status == "not_found":
+        ui.badge("Ollama not found. Please install it.", color="red", outline=True)
+        return  # Do not render further sidebar options
+    elif ollama_status == "failed_to_start":
+        ui.badge("Failed to start Ollama. Check for conflicts.", color="red", outline=True)
+        return
 
-def render_main_page() -> None:
+    # Model selection dropdown
+    def select_model(e: events.ValueChangeEventArguments) -> None:
+        state.selected_model = e.value
+        warm_up_model(e.value)
+
+    if installed_models:
+        ui.select(installed_models, label="Choose LLM Model", value=state.model, on_change=select_model)
+    else:
+        ui.label("No Ollama models found.")
+
+    async def refresh_models() -> None:
+        # Models pulled or removed with the ollama CLI stay invisible until the cached list is dropped
+        global installed_models, default_model
+        ollama_manager.invalidate_models()
+        installed_models = await nicegui_run.io_bound(ollama_manager.get_installed_models)
+        if default_model not in installed_models:
+            default_model = installed_models[0] if installed_models else None
+        render_sidebar_content.refresh()
+
+    ui.button("Refresh Models", on_click=refresh_models)
+
+    ui.separator()
+    ui.label("Service Management").classes("text-h6")
+
+    async def stop_service() -> None:
+        # stop() can wait several seconds for Ollama to exit; keep the event loop free meanwhile
+        await nicegui_run.io_bound(ollama_manager.stop)
+        ui.notify("Ollama service stopped.", type="positive")
+
+    ui.button("Stop Ollama Service", on_click=stop_service)
+    ui.markdown("Ollama is automatically managed. It will shut down if this app started it and you close the app.")
+
+
+def get_vector_index(pdf_bytes: bytes | None, pdf_hash: str, filename: str, model: str) -> VectorStoreIndex | None:
+    """Returns the PDF's vector index, parsing and building (or loading) it on first use; runs off the event loop.
+    pdf_bytes may be None once the PDF has been parsed, as the content-hash cache then supplies its pages.
+    """
+    index_name = f"vector_{pdf_hash}"
+    with build_lock(index_name):
+        index = vector_indexes.get(pdf_hash)
+        if index is None:
+            configure_llama_index_settings(llm_model_name=model)
+            try:
+                documents = document_loader.load_pdf(pdf_bytes, filename, pdf_hash=pdf_hash)
+            except Exception as e:
+                log.error("Failed to read PDF '%s': %s", filename, e)
+                return None
+            index = index_builder.get_vector_index(documents, index_name=index_name)
+            if index is None:
+                return None
+            vector_indexes.put(pdf_hash, index)
+    return index
+
+
+def get_query_engine(pdf_hash: str, filename: str, model: str):
+    """Returns the query engine for a processed PDF and model, building it on first use; runs off the event loop."""
+    key = (pdf_hash, model)
+    query_engine = query_engines.get(key)
+    if query_engine is None:
+        # Resolved before taking the engine lock, which keeps the build locks from nesting
+        index = get_vector_index(None, pdf_hash, filename, model)
+        if index is None:
+            return None
+        with build_lock(("engine", *key)):
+            query_engine = query_engines.get(key)
+            if query_engine is None:
+                query_engine = query_handler.get_vector_query_engine(index, streaming=True, llm=get_llm(model))
+                if query_engine is None:
+                    return None
+                query_engines.put(key, query_engine)
+    return query_engine
+
+
+def get_summary_engine(pdf_hash: str, model: str):
+    """Returns a summary query engine for a processed PDF, building its summary index on first use; runs off the event loop.
+    Engines are built per summary: each gets a fresh Ollama client, since concurrent tree_summarize runs every
+    query under a new event loop and a client's AsyncClient stays bound to the first loop it ran on.
+    """
+    index_name = f"summary_{pdf_hash}"
+    with build_lock(index_name):
+        index = summary_indexes.get(pdf_hash)
+        if index is None:
+            configure_llama_index_settings(llm_model_name=model)
+            documents = document_loader.load_cached(pdf_hash)
+            if documents is None:
+                log.warning("No cached pages for PDF %s; trying its persisted summary index.", pdf_hash)
+            # Without documents, get_summary_index loads the persisted index if there is one
+            index = index_builder.get_summary_index(documents, index_name=index_name)
+            if index is None and (vector_index := vector_indexes.get(pdf_hash)) is not None:
+                log.warning("Summarizing PDF %s from the chunks of its vector index.", pdf_hash)
+                index = SummaryIndex(list(vector_index.docstore.docs.values()))
+            if index is None:
+                log.error("Cannot summarize PDF %s: no cached pages, persisted summary index or loaded vector index.", pdf_hash)
+                return None
+            summary_indexes.put(pdf_hash, index)
+    return query_handler.get_summary_query_engine(index, use_async=True, streaming=True, llm=create_llm(model))
+
+
+async def stream_to(target: ui.markdown, tokens: Iterator[str]) -> None:
+    """Render tokens into a markdown element as the LLM produces them.
+    One worker thread drains the generator while the event loop redraws at most every STREAM_FLUSH_INTERVAL,
+    so long answers cost one thread hop and a few dozen updates instead of one of each per token.
+    """
+    parts: list[str] = []
+    target.set_content("")
+    drain = asyncio.create_task(nicegui_run.io_bound(parts.extend, tokens))
+    shown = 0
+    while shown < len(parts) or not drain.done():
+        await asyncio.wait({drain}, timeout=STREAM_FLUSH_INTERVAL)
+        if len(parts) > shown:
+            shown = len(parts)
+            target.set_content("".join(parts[:shown]))
+    await drain
+
+
+def render_main_page(state: ClientState) -> None:
     """Render the main interaction page."""
     ui.label("MedLegalLLM App").classes("text-h4 mb-4")
 
@@ -76,31 +271,71 @@ def render_main_page() -> None:
     output_area = ui.column().classes("w-full")
 
     async def on_file_uploaded(e: events.UploadEventArguments):
-        file = e.files[0]
+        pdf_bytes: bytes | None = e.content.read()
+        pdf_name = e.name
+        processed = False
+        # Indexes live in the shared caches; a page only keeps the content hash pointing into them
+        pdf_hash = await nicegui_run.io_bound(DocumentLoader.fingerprint, pdf_bytes)
 
         output_area.clear()
-        output_area.add(ui.markdown(f"File **{file.name}** uploaded."))
-
-        async def process_pdf() -> None:
-            ui.notify(f"Processing {file.name}…", type="info")
-            # TODO: hook in real document processing here
-            ui.notify(f"'{file.name}' processed (placeholder).", type="positive")
-
-        ui.button(f"Process {file.name}", on_click=process_pdf)
-
-        # -------- Query Section --------
-        ui.label("2. Query Document").classes("text-h5 mt-4")
-        query_input = ui.input(label="Ask a question:")
-
-        def perform_search():
-            if not query_input.value:
-                ui.notify("Please enter a query first.", type="warning")
-                return
-            ui.notify("Searching…", type="info")
-            # TODO: replace with real query logic
-            ui.markdown("This is a placeholder response.")
-
-        ui.button("Search", on_click=perform_search)
+        with output_area:
+            ui.markdown(f"File **{pdf_name}** uploaded.")
+
+            async def process_pdf() -> None:
+                nonlocal pdf_bytes, processed
+                if not state.model:
+                    ui.notify("Select an Ollama model first.", type="warning")
+                    return
+                if pdf_hash not in vector_indexes:
+                    ui.notify(f"Processing {pdf_name}…", type="info")
+                process_button.disable()  # No second build from a double-click
+                try:
+                    index = await nicegui_run.io_bound(get_vector_index, pdf_bytes, pdf_hash, pdf_name, state.model)
+                finally:
+                    process_button.enable()
+                if index is None:
+                    ui.notify(f"Failed to process '{pdf_name}'.", type="negative")
+                    return
+                pdf_bytes = None  # The PDF cache and the shared index now hold the content
+                processed = True
+                ui.notify(f"'{pdf_name}' processed.", type="positive")
+
+            process_button = ui.button(f"Process {pdf_name}", on_click=process_pdf)
+
+            # -------- Query Section --------
+            ui.label("2. Query Document").classes("text-h5 mt-4")
+            query_input = ui.input(label="Ask a question:")
+            answer = ui.markdown()
+
+            async def perform_search():
+                if not query_input.value:
+                    ui.notify("Please enter a query first.", type="warning")
+                    return
+                if not processed:
+                    ui.notify("Please process the document first.", type="warning")
+                    return
+                ui.notify("Searching…", type="info")
+                query_engine = await nicegui_run.io_bound(get_query_engine, pdf_hash, pdf_name, state.model)
+                await stream_to(answer, query_handler.stream_query(query_engine, query_input.value))
+
+            ui.button("Search", on_click=perform_search)
+
+            # -------- Summary Section --------
+            ui.label("3. Summarize Document").classes("text-h5 mt-4")
+            summary = ui.markdown()
+
+            async def generate_summary():
+                if not processed:
+                    ui.notify("Please process the document first.", type="warning")
+                    return
+                ui.notify("Generating summary…", type="info")
+                query_engine = await nicegui_run.io_bound(get_summary_engine, pdf_hash, state.model)
+                if query_engine is None:
+                    ui.notify(f"Could not summarize '{pdf_name}'; process it again.", type="negative")
+                    return
+                await stream_to(summary, query_handler.stream_query(query_engine, "Summarize the key points of this document."))
+
+            ui.button("Generate Summary", on_click=generate_summary)
 
     # Upload component must be created after defining the handler
     upload = ui.upload(
@@ -112,20 +347,26 @@ def render_main_page() -> None:
 
 
 @ui.page("/")
-def main_page():
+async def main_page(client: Client):
     """Entry point for the NiceGUI single-page app."""
-    setup_ollama()
-
+    state = ClientState()
     # Render persistent sidebar first so page layout reserves space
-    render_sidebar()
+    render_sidebar(state)
 
     # Render main content
     with ui.column().classes("p-4 space-y-4"):
-        render_main_page()
+        render_main_page(state)
+
+    # Probe/start Ollama only after the page is on screen
+    await client.connected()
+    await setup_ollama()
 
 
 def run():
     """Run the NiceGUI application."""
+    # The app's own modules log at INFO; third-party loggers (httpx, sentence-transformers) stay at WARNING
+    logging.basicConfig(format="%(levelname)s %(name)s: %(message)s")
+    logging.getLogger("src").setLevel(logging.INFO)
     ui.run(title="MedLegalLLM App", reload=False)
 
 
@@ -1,12 +1,22 @@
 import subprocess
+import socket
+from urllib.parse import urlparse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 import os
 import signal
 import atexit
-import psutil
-import sys
-import json
+import orjson
+import logging
+
+log = logging.getLogger(__name__)
+
+MODELS_CACHE_TTL = 30  # seconds
+STARTUP_TIMEOUT = 15  # seconds
+ALIVE_TTL = 2  # seconds
+WARM_UP_TIMEOUT = 120  # seconds; loading a large model from disk can take a while
 
 class OllamaManager:
     """
@@ -19,7 +29,23 @@ class OllamaManager:
     def __init__(self, host: str = "http://localhost:11434"):
         self.host = host
         self.ollama_process = None
+        self._owner_pid = None  # PID of the process that spawned ollama_process
         self._atexit_registered = False
+        self._models_cache = None  # (monotonic timestamp, model names)
+        self._alive_until = 0.0  # monotonic time until which the last successful liveness check is trusted
+        # Keep-alive session so readiness probes, model listings and warm-ups reuse one connection to this host.
+        self._session = requests.Session()
+        # Transient 5xx and dropped reads are retried inside urllib3; refused connections fail fast so
+        # liveness checks against a stopped service stay quick.
+        retry = Retry(
+            total=2,
+            connect=0,
+            backoff_factor=0.1,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            raise_on_status=False,
+        )
+        self._session.mount("http://", HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=2))
 
     def _register_atexit(self):
         """Registers the stop method to be called at exit, if not already registered."""
@@ -40,12 +66,26 @@ class OllamaManager:
         # We don't modify self._atexit_registered here, as it tracks registration, not execution.
 
     def is_ollama_running(self) -> bool:
-        """Checks if the Ollama service is accessible."""
+        """Checks if the Ollama service is accessible; a positive answer is trusted for ALIVE_TTL seconds."""
+        if time.monotonic() < self._alive_until:
+            return True
         try:
-            response = requests.get(self.host)
-            # Ollama root path returns "Ollama is running"
-            return response.status_code == 200 and "Ollama is running" in response.text
-        except requests.exceptions.ConnectionError:
+            # HEAD / answers 200 without a body or enumerating models, unlike /api/tags
+            response = self._session.head(self.host, timeout=1)
+        except requests.exceptions.RequestException:
+            return False
+        if response.status_code == 200:
+            self._alive_until = time.monotonic() + ALIVE_TTL
+            return True
+        return False
+
+    def _is_port_open(self) -> bool:
+        """Cheap TCP probe of the Ollama port, used while waiting for the service to come up."""
+        url = urlparse(self.host)
+        try:
+            socket.create_connection((url.hostname, url.port or 11434), timeout=0.1).close()
+            return True
+        except OSError:
             return False
 
     def start(self) -> str:
@@ -57,91 +97,125 @@ class OllamaManager:
                  "already_running", "started", "not_found", or "failed_to_start".
         """
         if self.is_ollama_running():
-            print("Ollama service is already running.")
+            log.info("Ollama service is already running.")
             return "already_running"
         
-        print("Ollama service not found. Attempting to start...")
+        log.info("Ollama service not found. Attempting to start...")
         try:
             self.ollama_process = subprocess.Popen(
                 ["ollama", "serve"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
+                # Nothing reads these; a full PIPE buffer would block ollama serve on write()
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True  # Own process group, so stop() can signal its runners in one call
             )
-            print(f"Ollama service started with PID: {self.ollama_process.pid}")
+            log.info("Ollama service started with PID: %s", self.ollama_process.pid)
+            self._owner_pid = os.getpid()
             self._register_atexit() # Register cleanup only if we start the process.
             
-            # Wait for the service to become available
-            time.sleep(5)  # Initial wait
-            
-            for _ in range(10):  # Poll for up to 10 more seconds
-                if self.is_ollama_running():
-                    print("Ollama service has become available.")
+            # Wait for the service to become available, probing the port with exponential backoff
+            deadline = time.monotonic() + STARTUP_TIMEOUT
+            delay = 0.01
+            while time.monotonic() < deadline:
+                if self._is_port_open() and self.is_ollama_running():
+                    log.info("Ollama service has become available.")
                     return "started"
-                time.sleep(1)
+                time.sleep(delay)
+                delay = min(delay * 2, 0.5)  # 10ms, 20ms, 40ms, ... capped at 500ms
             
             # If it's still not running, something went wrong
             self.stop() # Clean up the zombie process
-            print("Error: Ollama service was started but failed to become available.")
+            log.error("Ollama service was started but failed to become available.")
             return "failed_to_start"
 
         except FileNotFoundError:
-            print("Error: 'ollama' command not found.")
-            print("Please ensure Ollama is installed and the command is in your system's PATH.")
+            log.error("'ollama' command not found.")
+            log.error("Please ensure Ollama is installed and the command is in your system's PATH.")
             return "not_found"
         except Exception as e:
-            print(f"An unexpected error occurred while trying to start Ollama: {e}")
+            log.error("An unexpected error occurred while trying to start Ollama: %s", e)
             return "failed_to_start"
 
     def stop(self):
         """Stops the Ollama service if it was started by this manager."""
+        # A forked child inherits this manager and its atexit hook, but must not kill its parent's Ollama
+        if self._owner_pid != os.getpid():
+            return
         if self.ollama_process and self.ollama_process.poll() is None:
-            print(f"Stopping Ollama service with PID: {self.ollama_process.pid}...")
+            log.info("Stopping Ollama service with PID: %s...", self.ollama_process.pid)
             try:
-                # Find and kill all child processes of the main process
-                parent = psutil.Process(self.ollama_process.pid)
-                for child in parent.children(recursive=True):
-                    child.terminate()
-                parent.terminate()
-                
-                # Wait for the process to terminate
-                self.ollama_process.wait(timeout=5)
-                print("Ollama service stopped.")
-            except psutil.NoSuchProcess:
-                print("Ollama process already terminated.")
-            except psutil.TimeoutExpired:
-                print("Timeout expired while stopping Ollama. Forcing kill.")
-                self.ollama_process.kill()
+                pgid = os.getpgid(self.ollama_process.pid)
+                os.killpg(pgid, signal.SIGTERM)
+                try:
+                    # Wait for the process to terminate
+                    self.ollama_process.wait(timeout=5)
+                    log.info("Ollama service stopped.")
+                except subprocess.TimeoutExpired:
+                    log.warning("Timeout expired while stopping Ollama. Forcing kill.")
+                    os.killpg(pgid, signal.SIGKILL)
+                    self.ollama_process.wait()
+            except ProcessLookupError:
+                log.info("Ollama process already terminated.")
             except Exception as e:
-                print(f"Error stopping Ollama service: {e}")
+                log.error("Error stopping Ollama service: %s", e)
             
+            self._alive_until = 0.0
+            self.invalidate_models()
             # Unregister the atexit hook to prevent it from running again
             self._unregister_atexit()
 
+    def warm_up(self, model: str, keep_alive: str | int = "5m") -> bool:
+        """
+        Loads a model into memory ahead of the first query and keeps it resident for keep_alive.
+        Ollama loads the model without generating anything when the prompt is empty.
+        """
+        try:
+            response = self._session.post(
+                f"{self.host}/api/generate",
+                json={"model": model, "keep_alive": keep_alive},
+                timeout=WARM_UP_TIMEOUT
+            )
+            return response.status_code == 200
+        except requests.exceptions.RequestException as e:
+            log.warning("Failed to warm up Ollama model '%s': %s", model, e)
+            return False
+
+    def invalidate_models(self):
+        """Drops the cached model list so the next get_installed_models() call refetches it."""
+        self._models_cache = None
+
     def get_installed_models(self) -> list:
         """
         Retrieves a list of locally installed Ollama models.
+        Results are cached for MODELS_CACHE_TTL seconds; call invalidate_models() once the list is known to have
+        changed (a model was pulled or removed). Stopping the service also drops the cache.
         Returns an empty list if the service is not running or on error.
         """
-        if not self.is_ollama_running():
-            print("Cannot get installed models, Ollama service is not running.")
-            return []
-        
+        if self._models_cache and time.monotonic() - self._models_cache[0] < MODELS_CACHE_TTL:
+            return list(self._models_cache[1])
+
         try:
-            response = requests.get(f"{self.host}/api/tags")
-            response.raise_for_status() # Raise an exception for bad status codes
-            models_data = response.json()
-            model_names = [model['name'] for model in models_data.get('models', [])]
-            return model_names
+            response = self._session.get(f"{self.host}/api/tags", timeout=2)
+            if response.status_code != 200:
+                log.warning("Failed to get installed models from Ollama: HTTP %s", response.status_code)
+                return []
+            models_data = orjson.loads(response.content)
+            model_names = tuple(model['name'] for model in models_data.get('models', []))
+            self._models_cache = (time.monotonic(), model_names)
+            return list(model_names)
+        except requests.exceptions.ConnectionError:
+            log.warning("Cannot get installed models, Ollama service is not running.")
+            return []
         except requests.exceptions.RequestException as e:
-            print(f"Failed to get installed models from Ollama: {e}")
+            log.warning("Failed to get installed models from Ollama: %s", e)
             return []
-        except json.JSONDecodeError:
-            print("Failed to parse the list of installed models from Ollama.")
+        except orjson.JSONDecodeError:
+            log.warning("Failed to parse the list of installed models from Ollama.")
             return []
 
 if __name__ == '__main__':
     # Example usage and testing of the OllamaManager
+    logging.basicConfig(level=logging.INFO)
     manager = OllamaManager()
     
     # The 'atexit' registration ensures 'manager.stop()' is called on script exit.
@@ -2,7 +2,7 @@
 This script is used to test the LlamaIndex library.
 It loads a document, indexes it, and then queries it.
 It uses the ChromaVectorStore to store the indexed documents.
-It uses the SimpleDirectoryReader to load the documents.
+It uses the PyMuPDFReader to load the documents.
 It uses the VectorStoreIndex to index the documents.
 It uses the query_engine to query the indexed documents.
 It uses the response_mode to keep the answers tight.
@@ -13,54 +13,77 @@ import os
 os.environ["OLLAMA_HOST"] = "http://localhost:11434"
 
 from llama_index.core import (
-    SimpleDirectoryReader,
     VectorStoreIndex,
     StorageContext,
     Settings,
 )
+from llama_index.core.postprocessor import SentenceTransformerRerank
+from llama_index.readers.file import PyMuPDFReader
 from llama_index.vector_stores.chroma import ChromaVectorStore
 from llama_index.llms.ollama import Ollama
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 import chromadb
+import torch
+from functools import lru_cache
 from pathlib import Path
 
 # configure models
 Settings.llm = Ollama(model="llama2", request_timeout=60.0, context_window=8000)
-Settings.embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-small-en-v1.5")
+
+@lru_cache(maxsize=1)
+def get_embed_model() -> HuggingFaceEmbedding:
+    """Loads the embedding model on first call and returns the same instance afterwards."""
+    embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-small-en-v1.5", embed_batch_size=64)
+    # int8 dynamic quantization of the transformer's Linear layers speeds up CPU embedding
+    if embed_model._model.device.type == "cpu":
+        torch.quantization.quantize_dynamic(embed_model._model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return embed_model
+
+Settings.embed_model = get_embed_model()
 
 pdf_path = Path("/Users/augmdc/Downloads/Recents/A review of machine learning approaches for electric vehicle energy consumption modelling in urban transportation.pdf")
 if not pdf_path.exists():
     print(f"Error: Document not found at {pdf_path}")
     exit()
 
-# Loading
-documents = SimpleDirectoryReader(input_files=[pdf_path]).load_data()
-
 # initialize client, setting path to save data
 db = chromadb.PersistentClient(path="./chroma_db")
 
-# create collection
+# create collection, tagged with the PDF's mtime so edits to the file force a re-embed
+source_mtime = str(pdf_path.stat().st_mtime_ns)
 chroma_collection = db.get_or_create_collection("test_collection")
+# Compare against the stored tag; passing metadata above would let some chromadb versions overwrite it first
+if (chroma_collection.metadata or {}).get("source_mtime") != source_mtime:
+    db.delete_collection("test_collection")
+    chroma_collection = db.create_collection("test_collection", metadata={"source_mtime": source_mtime})
 
 # assign chroma as the vector_store to the context
 vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
 storage_context = StorageContext.from_defaults(vector_store=vector_store)
 
-# create your index
-index = VectorStoreIndex.from_documents(
-    documents, storage_context=storage_context
-)
+# create your index, reusing the persisted vectors instead of re-embedding the PDF
+if chroma_collection.count() == 0:
+    # Loading (MuPDF parses pages in C, several times faster than pypdf)
+    documents = PyMuPDFReader().load(file_path=pdf_path)
+    index = VectorStoreIndex.from_documents(
+        documents, storage_context=storage_context
+    )
+else:
+    index = VectorStoreIndex.from_vector_store(vector_store, embed_model=Settings.embed_model)
 
 # Storing is handled by ChromaDB's persistent client.
 
-# Querying
+# Querying: retrieve broadly, then let a cross-encoder keep the 3 best chunks for a shorter LLM prompt
+rerank = SentenceTransformerRerank(model="BAAI/bge-reranker-base", top_n=3)
 query_engine = index.as_query_engine(
-        similarity_top_k=5,
-        response_mode="compact"   # keeps answers tight
+        similarity_top_k=20,
+        node_postprocessors=[rerank],
+        response_mode="compact",  # keeps answers tight
+        streaming=True,           # print tokens as Ollama generates them
 )
 
 response = query_engine.query("Give me a summary of the document")
-print(response)
+response.print_response_stream()
 
 # Retrieving
 
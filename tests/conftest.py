@@ -0,0 +1,40 @@
+import asyncio
+import sys
+from pathlib import Path
+from typing import ClassVar
+
+import pytest
+from llama_index.core import Settings
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.llms import LLMMetadata, MockLLM
+from pydantic import PrivateAttr
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+@pytest.fixture(autouse=True)
+def mock_models():
+    """Runs every test against in-process mock models instead of Ollama and HuggingFace."""
+    Settings.llm = MockLLM(max_tokens=5)
+    Settings.embed_model = MockEmbedding(embed_dim=8)
+
+
+class LoopBoundLLM(MockLLM):
+    """Mimics an Ollama client, whose AsyncClient stays bound to the first event loop it ran on."""
+
+    async_calls: ClassVar[int] = 0
+    _loop: asyncio.AbstractEventLoop | None = PrivateAttr(default=None)
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        # A small context window makes tree_summarize summarize several chunks before the final reduce
+        return LLMMetadata(context_window=512, num_output=self.max_tokens or -1)
+
+    async def acomplete(self, prompt, formatted=False, **kwargs):
+        loop = asyncio.get_running_loop()
+        if self._loop is None:
+            self._loop = loop
+        elif self._loop is not loop:
+            raise RuntimeError("Event loop is closed")
+        LoopBoundLLM.async_calls += 1
+        return self.complete(prompt, formatted=formatted, **kwargs)
@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from llama_index.core import Document
+
+from conftest import LoopBoundLLM
+from src.ui import app
+
+
+def test_two_summaries_in_a_row(tmp_path, monkeypatch):
+    documents = [Document(text=f"Clause {i} limits liability for negligence. " * 400) for i in range(3)]
+    monkeypatch.setattr(app, "configure_llama_index_settings", lambda **kwargs: None)
+    monkeypatch.setattr(app, "create_llm", lambda model: LoopBoundLLM(max_tokens=5))
+    monkeypatch.setattr(LoopBoundLLM, "async_calls", 0)
+    monkeypatch.setattr(app.index_builder, "persist_root_dir", str(tmp_path))
+    monkeypatch.setattr(app.document_loader, "load_cached", lambda pdf_hash: documents)
+
+    def summarize() -> str:
+        query_engine = app.get_summary_engine("two-summaries", "mock")
+        return "".join(app.query_handler.stream_query(query_engine, "Summarize the key points of this document."))
+
+    # Each summary runs in a worker thread without an event loop, as under nicegui's io_bound
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        for _ in range(2):
+            summary = pool.submit(summarize).result()
+            assert summary and not summary.startswith("Error during query")
+    # The per-chunk summaries really went through the concurrent path
+    assert LoopBoundLLM.async_calls > 0
+
+
+def test_summary_without_cached_pages(tmp_path, monkeypatch):
+    documents = [Document(text=f"Clause {i} limits liability for negligence.") for i in range(3)]
+    monkeypatch.setattr(app, "configure_llama_index_settings", lambda **kwargs: None)
+    monkeypatch.setattr(app.index_builder, "persist_root_dir", str(tmp_path))
+    monkeypatch.setattr(app, "create_llm", lambda model: LoopBoundLLM(max_tokens=5))
+    monkeypatch.setattr(app.document_loader, "load_cached", lambda pdf_hash: None)
+
+    # A summary index persisted by an earlier session is loaded from disk
+    app.index_builder.get_summary_index(documents, index_name="summary_persisted")
+    assert app.get_summary_engine("persisted", "mock") is not None
+    # Otherwise the chunks of the PDF's loaded vector index stand in for the pages
+    app.vector_indexes.put("in-memory", app.VectorStoreIndex.from_documents(documents))
+    assert app.get_summary_engine("in-memory", "mock") is not None
+    assert app.get_summary_engine("unknown", "mock") is None
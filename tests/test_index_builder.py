@@ -0,0 +1,98 @@
+import os
+from typing import ClassVar, List
+
+import pytest
+from llama_index.core import Document, Settings, StorageContext
+from llama_index.core.embeddings import MockEmbedding
+
+from src.core.index_builder import IndexBuilder
+
+
+class CountingEmbedding(MockEmbedding):
+    """Records every batch of texts it embeds."""
+
+    batches: ClassVar[List[List[str]]] = []
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        CountingEmbedding.batches.append([text])
+        return super()._get_text_embedding(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        CountingEmbedding.batches.append(list(texts))
+        return [self._get_vector() for _ in texts]
+
+
+@pytest.fixture
+def persists(monkeypatch):
+    """Counts StorageContext.persist calls."""
+    calls = []
+    persist = StorageContext.persist
+    monkeypatch.setattr(StorageContext, "persist", lambda self, *args, **kwargs: calls.append(1) or persist(self, *args, **kwargs))
+    return calls
+
+
+@pytest.fixture(autouse=True)
+def counting_embedding(monkeypatch):
+    monkeypatch.setattr(CountingEmbedding, "batches", [])
+    Settings.embed_model = CountingEmbedding(embed_dim=8)
+
+
+def pages(*texts: str) -> List[Document]:
+    # Mirrors DocumentLoader: one Document per page, with content-derived ids
+    return [Document(id_=f"pdf-p{i}", text=text, metadata={"page": i + 1}) for i, text in enumerate(texts)]
+
+
+TEXTS = ("Clause one covers consent.", "Clause two covers liability.", "Clause three covers records.")
+
+
+def build(tmp_path) -> None:
+    IndexBuilder(str(tmp_path)).get_vector_index(pages(*TEXTS), index_name="vector_pdf")
+    CountingEmbedding.batches.clear()
+
+
+def test_reload_with_identical_pages_skips_embedding_and_persist(tmp_path, persists):
+    build(tmp_path)
+    persists.clear()
+
+    index = IndexBuilder(str(tmp_path)).get_vector_index(pages(*TEXTS), index_name="vector_pdf")
+
+    assert index is not None
+    assert CountingEmbedding.batches == []
+    assert persists == []
+
+
+def test_unchanged_pages_without_corpus_marker_skip_persist(tmp_path, persists):
+    build(tmp_path)
+    persists.clear()
+    os.remove(tmp_path / "vector_pdf" / "corpus_hash")
+
+    IndexBuilder(str(tmp_path)).get_vector_index(pages(*TEXTS), index_name="vector_pdf")
+
+    assert CountingEmbedding.batches == []
+    assert persists == []
+    assert (tmp_path / "vector_pdf" / "corpus_hash").exists()
+
+
+def test_only_the_changed_page_is_updated(tmp_path, persists):
+    build(tmp_path)
+    persists.clear()
+
+    index = IndexBuilder(str(tmp_path)).get_vector_index(pages(TEXTS[0], "Clause two was amended.", TEXTS[2]), index_name="vector_pdf")
+
+    [[embedded]] = CountingEmbedding.batches
+    assert "Clause two was amended." in embedded
+    assert persists == [1]
+    assert len(index.docstore.docs) == len(TEXTS)
+
+
+def test_new_pages_are_inserted_in_one_batch(tmp_path, persists):
+    build(tmp_path)
+    persists.clear()
+
+    IndexBuilder(str(tmp_path)).get_vector_index(pages(*TEXTS, "Clause four covers fees.", "Clause five covers venue."), index_name="vector_pdf")
+
+    [batch] = CountingEmbedding.batches
+    assert len(batch) == 2
+    assert any("Clause four covers fees." in text for text in batch)
+    assert any("Clause five covers venue." in text for text in batch)
+    assert persists == [1]
@@ -0,0 +1,40 @@
+from llama_index.core import Document, VectorStoreIndex
+from llama_index.core.retrievers import QueryFusionRetriever
+
+from conftest import LoopBoundLLM
+from src.core.query_handler import QueryHandler
+
+
+def test_hybrid_search_on_corpus_smaller_than_top_k():
+    index = VectorStoreIndex.from_documents([Document(text="Informed consent must be documented before surgery.")])
+    query_handler = QueryHandler()
+    query_engine = query_handler.get_vector_query_engine(index, similarity_top_k=3)
+
+    answer = query_handler.query_index(query_engine, "When must consent be documented?")
+
+    assert not answer.startswith("Error during query")
+
+
+def test_hybrid_search_skipped_for_empty_index(caplog):
+    # A scanned PDF has no text layer, so no nodes reach the index
+    index = VectorStoreIndex(nodes=[])
+    query_handler = QueryHandler()
+    query_engine = query_handler.get_vector_query_engine(index)
+
+    assert not isinstance(query_engine.retriever, QueryFusionRetriever)
+    assert "Falling back to vector search" not in caplog.text
+    assert not query_handler.query_index(query_engine, "When must consent be documented?").startswith("Error during query")
+
+
+def test_batch_queries_can_repeat(monkeypatch):
+    monkeypatch.setattr(LoopBoundLLM, "async_calls", 0)
+    index = VectorStoreIndex.from_documents([Document(text=f"Clause {i} limits liability.") for i in range(4)])
+    query_handler = QueryHandler()
+    # One cached engine and client across batches, as the app keeps them
+    query_engine = query_handler.get_vector_query_engine(index, llm=LoopBoundLLM(max_tokens=5))
+
+    for _ in range(2):
+        answers = query_handler.query_index_batch(query_engine, ["What is limited?", "Which clause?"])
+        assert len(answers) == 2
+        assert not any(answer.startswith("Error during query") for answer in answers)
+    assert LoopBoundLLM.async_calls == 4